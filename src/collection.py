@@ -3,10 +3,21 @@ Data Collection Module
 Downloads temperature data from NOAA Climate Data API
 """
 
-import tomllib
 import requests
-import csv
+import numpy as np
 from pathlib import Path
+from config import load_config
+
+
+# Synthetic region profiles, indexed by region_id:
+# (base_temp, temp_mod, var_base, var_mod)
+REGIONS = (
+    (-15, 5, 8, 3),   # Arctic (cold, low variance)
+    (15, 8, 12, 4),   # Temperate (moderate, medium variance)
+    (25, 6, 7, 3),    # Subtropical (warm, low variance)
+    (28, 4, 5, 2),    # Tropical (hot, very low variance)
+)
+SAMPLES_PER_REGION = 30
 
 
 def download_data():
@@ -18,8 +29,7 @@ def download_data():
         str: Path to the downloaded data file
     """
     # Load configuration
-    with open("params.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_config()
     
     print("Loading configuration...")
     data_config = config["data"]
@@ -36,30 +46,19 @@ def download_data():
     
     # Simulate temperature data for different stations/locations
     # Each row: [location_id, avg_temp, temp_variance]
-    sample_data = []
-    
-    # Arctic region (cold, low variance)
-    for i in range(30):
-        sample_data.append([0, -15 + (i % 5), 8 + (i % 3)])
-    
-    # Temperate region (moderate, medium variance)
-    for i in range(30):
-        sample_data.append([1, 15 + (i % 8), 12 + (i % 4)])
-    
-    # Subtropical region (warm, low variance)
-    for i in range(30):
-        sample_data.append([2, 25 + (i % 6), 7 + (i % 3)])
-    
-    # Tropical region (hot, very low variance)
-    for i in range(30):
-        sample_data.append([3, 28 + (i % 4), 5 + (i % 2)])
+    i = np.arange(SAMPLES_PER_REGION)
+    sample_data = np.vstack([
+        np.column_stack([np.full(SAMPLES_PER_REGION, region_id), base + i % mod, var + i % var_mod])
+        for region_id, (base, mod, var, var_mod) in enumerate(REGIONS)
+    ])
     
     # Write to file
     output_path = output_config["input_data"]
-    with open(output_path, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["region_id", "avg_temp_celsius", "temp_variance"])
-        writer.writerows(sample_data)
+    # Format all rows with one string operation and a single write
+    row_format = ",".join(["%d"] * sample_data.shape[1]) + "\n"
+    body = (row_format * len(sample_data)) % tuple(sample_data.ravel().tolist())
+    with open(output_path, "wb") as f:
+        f.write(b"region_id,avg_temp_celsius,temp_variance\n" + body.encode("ascii"))
     
     print(f"Data saved to {output_path}")
     print(f"Total samples: {len(sample_data)}")
@@ -76,8 +75,7 @@ def download_data_from_api():
     # This is a template for actual API usage
     # NOAA API requires token: https://www.ncdc.noaa.gov/cdo-web/token
     
-    with open("params.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_config()
     
     data_config = config["data"]
     
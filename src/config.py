@@ -0,0 +1,39 @@
+"""
+Configuration Module
+Loads pipeline parameters from params.toml
+"""
+
+import functools
+import os
+
+try:
+    import tomli_rs as _toml
+except ImportError:
+    import tomllib as _toml
+
+
+@functools.lru_cache(maxsize=4)
+def _parse(path, mtime):
+    """
+    Parses a TOML file. The modification time is part of the cache key,
+    so edits to the file invalidate the cached result.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return _toml.loads(f.read())
+
+
+def load_config(path="params.toml"):
+    """
+    Reads and parses the pipeline configuration file.
+    Uses the Rust-backed tomli_rs parser when installed, falling back to
+    the standard library tomllib otherwise. Parsed results are cached per
+    (path, mtime), so repeated calls in one process skip the re-parse.
+
+    Args:
+        path (str): Path to the TOML configuration file
+
+    Returns:
+        dict: Parsed configuration (shared between callers, do not mutate)
+    """
+    path = os.path.abspath(path)
+    return _parse(path, os.stat(path).st_mtime_ns)
@@ -3,13 +3,93 @@ Processing Module
 Runs K-Means clustering on temperature data and stores metrics
 """
 
-import tomllib
-import csv
-import json
+import hashlib
+import os
+import tempfile
 from pathlib import Path
 import numpy as np
-from sklearn.cluster import KMeans
+import sklearn
+from joblib import dump, load
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.metrics import silhouette_score, davies_bouldin_score, calinski_harabasz_score
+from config import load_config
+
+try:
+    import orjson
+except ImportError:
+    import json
+    orjson = None
+
+    class _NumpyEncoder(json.JSONEncoder):
+        """JSON encoder that serializes NumPy arrays as nested lists."""
+
+        def default(self, o):
+            if isinstance(o, np.ndarray):
+                return o.tolist()
+            return super().default(o)
+
+
+# Bump when the fitting procedure changes, so cached models fitted by
+# the old procedure are no longer reused
+_MODEL_CACHE_VERSION = 2
+
+
+def _make_estimator(clustering_config):
+    """
+    Creates the unfitted clustering estimator.
+    
+    Returns:
+        MiniBatchKMeans: Estimator configured from the clustering parameters
+    """
+    return MiniBatchKMeans(
+        n_clusters=clustering_config["n_clusters"],
+        random_state=clustering_config["random_state"],
+        max_iter=clustering_config["max_iter"],
+        n_init=clustering_config["n_init"],
+        batch_size=clustering_config.get("batch_size", 1024),
+        reassignment_ratio=0.01
+    )
+
+
+def _model_cache_path(input_path, clustering_config, model_dir):
+    """
+    Builds the cache path of the fitted model for the given input data
+    and fitting setup. The key covers the estimator class and its full
+    parameters, the scikit-learn version and _MODEL_CACHE_VERSION;
+    metrics-only settings are left out.
+    
+    Returns:
+        Path: Path to the cached model file
+    """
+    estimator = _make_estimator(clustering_config)
+    fit_key = (
+        _MODEL_CACHE_VERSION,
+        sklearn.__version__,
+        type(estimator).__name__,
+        sorted(estimator.get_params().items()),
+    )
+    
+    with open(input_path, "rb") as f:
+        digest = hashlib.file_digest(f, "blake2b")
+    digest.update(repr(fit_key).encode())
+    return Path(model_dir) / f"kmeans-{digest.hexdigest()[:16]}.joblib"
+
+
+def _save_model(model, model_path):
+    """
+    Stores a fitted model in the cache. The model is written to a
+    temporary file in the same directory and then moved into place, so
+    an interrupted run never leaves a truncated file at the cache path.
+    """
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=model_path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        dump(model, tmp_path)
+        os.replace(tmp_path, model_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 def run_kmeans_analysis():
@@ -21,8 +101,7 @@ def run_kmeans_analysis():
         dict: Dictionary containing clustering metrics and results
     """
     # Load configuration
-    with open("params.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_config()
     
     print("Loading configuration...")
     clustering_config = config["clustering"]
@@ -30,33 +109,42 @@ def run_kmeans_analysis():
     
     # Load input data
     print(f"Reading data from {output_config['input_data']}...")
-    data = []
-    with open(output_config["input_data"], "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            data.append([
-                float(row["avg_temp_celsius"]),
-                float(row["temp_variance"])
-            ])
-    
-    X = np.array(data)
+    # Columns: region_id, avg_temp_celsius, temp_variance
+    X = np.loadtxt(
+        output_config["input_data"],
+        delimiter=",",
+        skiprows=1,
+        usecols=(1, 2),
+        dtype=np.float32,
+        ndmin=2
+    )
     print(f"Loaded {len(X)} samples with {X.shape[1]} features")
     
-    # Run K-Means clustering
-    print(f"Running K-Means with {clustering_config['n_clusters']} clusters...")
-    kmeans = KMeans(
-        n_clusters=clustering_config["n_clusters"],
-        random_state=clustering_config["random_state"],
-        max_iter=clustering_config["max_iter"],
-        n_init=clustering_config["n_init"]
-    )
+    # Reuse a previously fitted model when the input data and fitting
+    # setup are unchanged
+    model_path = _model_cache_path(output_config["input_data"], clustering_config, output_config["model_dir"])
     
-    labels = kmeans.fit_predict(X)
+    if model_path.exists():
+        print(f"Loading cached model from {model_path}...")
+        kmeans = load(model_path)
+    else:
+        # Run K-Means clustering
+        print(f"Running Mini-Batch K-Means with {clustering_config['n_clusters']} clusters...")
+        kmeans = _make_estimator(clustering_config).fit(X)
+        
+        _save_model(kmeans, model_path)
+    
+    labels = kmeans.labels_
+    
+    # Per-cluster offsets into the sorted labels give the cluster sizes.
+    # X itself is not reordered: that would copy it, and silhouette_score
+    # samples by position, so reordering would change the sampled points
+    offsets = np.searchsorted(np.sort(labels), np.arange(clustering_config["n_clusters"] + 1))
     
     # Calculate clustering metrics
     print("Calculating metrics...")
     metrics = {
-        "algorithm": "K-Means",
+        "algorithm": "Mini-Batch K-Means",
         "n_clusters": clustering_config["n_clusters"],
         "n_samples": int(len(X)),
         "n_features": int(X.shape[1]),
@@ -64,33 +152,45 @@ def run_kmeans_analysis():
         
         # Quality metrics
         "inertia": float(kmeans.inertia_),
-        "silhouette_score": float(silhouette_score(X, labels)),
+        "silhouette_score": float(silhouette_score(
+            X, labels,
+            sample_size=min(len(X), clustering_config.get("silhouette_sample_size", 2000)),
+            random_state=clustering_config["random_state"]
+        )),
         "davies_bouldin_score": float(davies_bouldin_score(X, labels)),
         "calinski_harabasz_score": float(calinski_harabasz_score(X, labels)),
         
         # Cluster information
-        "cluster_centers": kmeans.cluster_centers_.tolist(),
-        "cluster_sizes": [int(np.sum(labels == i)) for i in range(clustering_config["n_clusters"])],
-        
-        # Labels for visualization
-        "labels": labels.tolist(),
-        "data_points": X.tolist()
+        # Widened to float64 so orjson and the stdlib fallback write the
+        # same digits for the float32 centers
+        "cluster_centers": kmeans.cluster_centers_.astype(np.float64),
+        "cluster_sizes": np.diff(offsets)
     }
     
     # Save metrics
     metrics_path = output_config["metrics_file"]
     Path(metrics_path).parent.mkdir(parents=True, exist_ok=True)
     
-    with open(metrics_path, "w") as f:
-        json.dump(metrics, f, indent=2)
+    if orjson is not None:
+        with open(metrics_path, "wb") as f:
+            f.write(orjson.dumps(metrics, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2))
+    else:
+        with open(metrics_path, "w") as f:
+            json.dump(metrics, f, indent=2, cls=_NumpyEncoder)
+    
+    # Save data points and labels for visualization
+    cluster_data_path = output_config["cluster_data"]
+    Path(cluster_data_path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez(cluster_data_path, X=X, labels=labels, centers=kmeans.cluster_centers_)
     
     print(f"\nMetrics saved to {metrics_path}")
+    print(f"Cluster data saved to {cluster_data_path}")
     print(f"  - Silhouette Score: {metrics['silhouette_score']:.3f} (higher is better, range: -1 to 1)")
     print(f"  - Davies-Bouldin Score: {metrics['davies_bouldin_score']:.3f} (lower is better)")
     print(f"  - Calinski-Harabasz Score: {metrics['calinski_harabasz_score']:.3f} (higher is better)")
     print(f"  - Inertia: {metrics['inertia']:.2f}")
     
-    print(f"\nCluster sizes: {metrics['cluster_sizes']}")
+    print(f"\nCluster sizes: {metrics['cluster_sizes'].tolist()}")
     
     return metrics
 
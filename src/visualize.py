@@ -1,62 +1,136 @@
 """
 Visualization Module
-Reads clustering metrics and creates visualization
+Reads clustering metrics and creates visualization and metrics summary
 """
 
-import os
-os.environ['MPLBACKEND'] = 'Agg'
-
-import tomllib
-import json
+import functools
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
+from config import load_config
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
-def visualize_results():
+
+# Figures reused across calls, keyed by (figsize, dpi, colormap)
+_FIG_CACHE = {}
+
+
+# Simplify line paths so large datasets do not emit one vector path per
+# marker; applied only while this module builds and saves its figures
+_RC_PARAMS = {
+    "path.simplify": True,
+    "path.simplify_threshold": 1.0,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _matplotlib():
     """
-    Reads clustering metrics and creates visualization.
-    Generates a comprehensive plot showing clusters, centers, and metrics.
+    Imports matplotlib on first use, so the import cost is only paid
+    when a figure is actually drawn.
     
     Returns:
-        str: Path to the saved visualization
+        module: matplotlib, with the figure and Agg backend modules loaded
     """
-    # Load configuration
-    with open("params.toml", "rb") as f:
-        config = tomllib.load(f)
+    import matplotlib
+    import matplotlib.backends.backend_agg
+    import matplotlib.figure
     
-    print("Loading configuration...")
-    output_config = config["output"]
-    viz_config = config["visualization"]
+    return matplotlib
+
+
+def _new_figure(**kwargs):
+    """
+    Creates an Agg-backed Figure that is not registered with pyplot,
+    so cached figures are never leaked.
     
-    # Load metrics
-    print(f"Reading metrics from {output_config['metrics_file']}...")
-    with open(output_config["metrics_file"], "r") as f:
-        metrics = json.load(f)
-    
-    # Extract data
-    X = np.array(metrics["data_points"])
-    labels = np.array(metrics["labels"])
-    centers = np.array(metrics["cluster_centers"])
-    
-    # Create figure with subplots
-    fig, axes = plt.subplots(1, 2, figsize=(viz_config["figure_width"], viz_config["figure_height"]))
-    
-    # Plot 1: Scatter plot with clusters
-    ax1 = axes[0]
-    
-    scatter = ax1.scatter(
-        X[:, 0], X[:, 1],
-        c=labels,
-        cmap=viz_config["colormap"],
-        alpha=0.7,
-        s=80,
-        edgecolors='w',
-        linewidth=0.5
-    )
+    Returns:
+        Figure: New empty figure
+    """
+    mpl = _matplotlib()
+    fig = mpl.figure.Figure(**kwargs)
+    mpl.backends.backend_agg.FigureCanvasAgg(fig)
+    return fig
+
+
+def render_metrics_panel(metrics, centers, output_path):
+    """
+    Writes the clustering metrics summary as a Markdown file.
+    
+    Returns:
+        str: Path to the saved metrics summary
+    """
+    lines = [
+        "# Clustering Metrics Summary",
+        "",
+        f"- Algorithm: {metrics['algorithm']}",
+        f"- Number of Clusters: {metrics['n_clusters']}",
+        f"- Total Samples: {metrics['n_samples']}",
+        "",
+        "## Quality Metrics",
+        "",
+        "| Metric | Value | Interpretation |",
+        "| --- | --- | --- |",
+        f"| Silhouette Score | {metrics['silhouette_score']:.4f} | Range -1 to 1, higher is better (cluster cohesion) |",
+        f"| Davies-Bouldin Score | {metrics['davies_bouldin_score']:.4f} | Lower is better (cluster separation) |",
+        f"| Calinski-Harabasz | {metrics['calinski_harabasz_score']:.2f} | Higher is better (variance ratio criterion) |",
+        f"| Inertia | {metrics['inertia']:.2f} | Sum of squared distances to centers |",
+        "",
+        "## Cluster Distribution",
+        "",
+        "| Cluster | Samples | Center (°C, variance) |",
+        "| --- | --- | --- |",
+    ]
+    
+    for i, size in enumerate(metrics['cluster_sizes']):
+        center = centers[i]
+        lines.append(f"| {i} | {size} | ({center[0]:.1f}°C, {center[1]:.1f}) |")
+    
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    
+    return output_path
+
+
+def _create_figure(viz_config, X, labels, centers, use_hexbin):
+    """
+    Creates the cluster plot figure.
+    
+    Returns:
+        tuple: Figure, data artist and cluster center artist
+    """
+    fig = _new_figure(figsize=(viz_config["figure_width"], viz_config["figure_height"]))
+    ax = fig.subplots()
+    
+    if use_hexbin:
+        # Too many points to draw individually: bin them into hexagons
+        # colored by the median cluster label of each bin
+        scatter = ax.hexbin(
+            X[:, 0], X[:, 1],
+            C=labels,
+            reduce_C_function=np.median,
+            gridsize=80,
+            cmap=viz_config["colormap"],
+            rasterized=True
+        )
+    else:
+        scatter = ax.scatter(
+            X[:, 0], X[:, 1],
+            c=labels,
+            cmap=viz_config["colormap"],
+            alpha=0.7,
+            s=80,
+            edgecolors='w',
+            linewidth=0.5,
+            rasterized=True
+        )
     
     # Plot cluster centers
-    ax1.scatter(
+    center_scatter = ax.scatter(
         centers[:, 0], centers[:, 1],
         c='red',
         marker='X',
@@ -64,82 +138,126 @@ def visualize_results():
         edgecolors='black',
         linewidth=2.5,
         label='Cluster Centers',
-        zorder=10
+        zorder=10,
+        rasterized=True
     )
     
-    ax1.set_xlabel('Average Temperature (°C)', fontsize=12)
-    ax1.set_ylabel('Temperature Variance', fontsize=12)
-    ax1.set_title('K-Means Clustering of Temperature Data', fontsize=14, fontweight='bold', pad=20)
-    ax1.legend(loc='best')
-    ax1.grid(True, alpha=0.3)
+    ax.set_xlabel('Average Temperature (°C)', fontsize=12)
+    ax.set_ylabel('Temperature Variance', fontsize=12)
+    ax.set_title('K-Means Clustering of Temperature Data', fontsize=14, fontweight='bold', pad=20)
+    ax.legend(loc='best')
+    ax.grid(True, alpha=0.3)
     
     # Add colorbar
-    cbar = plt.colorbar(scatter, ax=ax1)
+    cbar = fig.colorbar(scatter, ax=ax)
     cbar.set_label('Cluster ID', fontsize=10)
     
-    # Plot 2: Metrics summary
-    ax2 = axes[1]
-    ax2.axis('off')
+    fig.tight_layout()
     
-    # Create metrics text
-    metrics_text = f"""
-    CLUSTERING METRICS SUMMARY
-    {'='*40}
+    return fig, scatter, center_scatter
+
+
+def _update_figure(cached, X, labels, centers):
+    """
+    Updates the artists of a cached figure in place with new results,
+    skipping axes, colorbar and layout reconstruction.
     
-    Algorithm: {metrics['algorithm']}
-    Number of Clusters: {metrics['n_clusters']}
-    Total Samples: {metrics['n_samples']}
+    Returns:
+        Figure: The updated figure
+    """
+    fig, scatter, center_scatter = cached
     
-    QUALITY METRICS:
-    {'─'*40}
-    Silhouette Score: {metrics['silhouette_score']:.4f}
-      → Range: -1 to 1 (higher is better)
-      → Measures cluster cohesion
+    scatter.set_offsets(X)
+    scatter.set_array(labels)
+    scatter.autoscale()
+    center_scatter.set_offsets(centers)
     
-    Davies-Bouldin Score: {metrics['davies_bouldin_score']:.4f}
-      → Lower is better
-      → Measures cluster separation
+    ax = scatter.axes
+    ax.ignore_existing_data_limits = True
+    ax.update_datalim(np.vstack([X, centers]))
+    ax.autoscale_view()
     
-    Calinski-Harabasz: {metrics['calinski_harabasz_score']:.2f}
-      → Higher is better
-      → Variance ratio criterion
+    return fig
+
+
+def render_scatter(viz_config, X, labels, centers, output_path):
+    """
+    Plots the clustered data points and cluster centers.
+    Scatter figures are cached, so repeated calls in one process only
+    update the plotted data.
     
-    Inertia: {metrics['inertia']:.2f}
-      → Sum of squared distances to centers
+    Returns:
+        str: Path to the saved plot
+    """
+    # Hexbin figures are rebuilt every time since their bins depend on the data
+    use_hexbin = len(X) > viz_config.get("max_scatter_points", 20000)
+    cache_key = (
+        viz_config["figure_width"], viz_config["figure_height"],
+        viz_config["dpi"], viz_config["colormap"]
+    )
+    cached = None if use_hexbin else _FIG_CACHE.get(cache_key)
     
-    CLUSTER DISTRIBUTION:
-    {'─'*40}
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    
+    # Let Pillow optimize PNG compression to keep the file small
+    save_kwargs = {}
+    if Path(output_path).suffix.lower() == ".png":
+        save_kwargs["pil_kwargs"] = {"optimize": True}
+    
+    # Scope the rcParams to this figure instead of the global defaults
+    with _matplotlib().rc_context(_RC_PARAMS):
+        if cached is not None:
+            fig = _update_figure(cached, X, labels, centers)
+        else:
+            created = _create_figure(viz_config, X, labels, centers, use_hexbin)
+            fig = created[0]
+            if not use_hexbin:
+                _FIG_CACHE[cache_key] = created
+        
+        fig.savefig(
+            output_path,
+            dpi=viz_config["dpi"],
+            bbox_inches='tight',
+            facecolor='white',
+            **save_kwargs
+        )
+    
+    return output_path
+
+
+def visualize_results():
     """
+    Reads clustering metrics and cluster data and creates visualization.
+    Saves a plot of the clusters and centers, and a Markdown summary of
+    the clustering metrics.
     
-    for i, size in enumerate(metrics['cluster_sizes']):
-        center = centers[i]
-        metrics_text += f"\n    Cluster {i}: {size} samples"
-        metrics_text += f"\n      Center: ({center[0]:.1f}°C, {center[1]:.1f})"
-    
-    ax2.text(
-        0.05, 0.95,
-        metrics_text,
-        transform=ax2.transAxes,
-        fontsize=9,
-        verticalalignment='top',
-        fontfamily='monospace',
-        bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.3)
-    )
+    Returns:
+        str: Path to the saved visualization
+    """
+    # Load configuration
+    config = load_config()
     
-    plt.tight_layout()
+    print("Loading configuration...")
+    output_config = config["output"]
+    viz_config = config["visualization"]
     
-    # Save figure
-    output_path = output_config["visualization"]
-    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    # Load metrics
+    print(f"Reading metrics from {output_config['metrics_file']}...")
+    with open(output_config["metrics_file"], "rb") as f:
+        metrics = json_loads(f.read())
     
-    plt.savefig(
-        output_path,
-        dpi=viz_config["dpi"],
-        bbox_inches='tight',
-        facecolor='white'
-    )
+    # Load data points, labels and centers
+    print(f"Reading cluster data from {output_config['cluster_data']}...")
+    with np.load(output_config["cluster_data"]) as cluster_data:
+        X = cluster_data["X"]
+        labels = cluster_data["labels"]
+        centers = cluster_data["centers"]
     
+    output_path = render_scatter(viz_config, X, labels, centers, output_config["visualization"])
     print(f"\nVisualization saved to {output_path}")
+    
+    summary_path = render_metrics_panel(metrics, centers, output_config["metrics_summary"])
+    print(f"Metrics summary saved to {summary_path}")
     print("Done!")
     
     return output_path